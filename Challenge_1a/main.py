@@ -7,32 +7,103 @@ Extracts structured outlines (title and headings) from PDF documents
 import os
 import json
 import re
+import hashlib
+import string
+import itertools
+from array import array
 from pathlib import Path
 import fitz  # PyMuPDF
 from typing import List, Dict, Any, Tuple
 import logging
+from multiprocessing import Pool, cpu_count
+
+try:
+    import re2  # google-re2: DFA engine, no backtracking on pathological input
+except ImportError:
+    re2 = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _compile(pattern: str):
+    """Compile with RE2 when available, falling back to re for patterns it rejects"""
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except re2.error:
+            pass
+    return re.compile(pattern)
+
+# Pre-compiled regex patterns (compiled once at import time instead of per call)
+_HEADING_PATTERN_STRINGS = [
+    # English patterns
+    r'^(?:Chapter|CHAPTER)\s+\d+',
+    r'^(?:Section|SECTION)\s+\d+',
+    r'^\d+\.?\s+[A-ZÀ-ſ][^.]*$',  # Unicode support for accented chars
+    r'^\d+\.\d+\.?\s+[A-ZÀ-ſ][^.]*$',
+    r'^\d+\.\d+\.\d+\.?\s+[A-ZÀ-ſ][^.]*$',
+    r'^[A-ZÀ-ſ][A-Z\sÀ-ſ]{2,}$',  # ALL CAPS headers with unicode
+    r'^[A-ZÀ-ſ][a-zÀ-ſ].*[^.]$',  # Title case without period
+    # Multilingual patterns (Japanese, Chinese, etc.); digits and spaces are
+    # written as explicit classes because RE2's \d and \s are ASCII-only and
+    # would miss the fullwidth digits common in Japanese headings
+    r'^第[0-9０-９]+章',  # Japanese chapter
+    r'^第[0-9０-９]+节',  # Chinese section
+    r'^[0-9０-９]+[．.][\s　]*[一-鿿぀-ゟ゠-ヿ]+',  # CJK with numbers
+]
+
+# Single fused alternation: one regex call per line instead of one per pattern
+_RE_HEADING_UNION = _compile('|'.join(
+    f'(?P<g{i}>{p})' for i, p in enumerate(_HEADING_PATTERN_STRINGS)
+))
+
+_RE_PAGE_NUMBER = _compile(r'^\d+$')
+
+# Cheap first-character gate: every heading pattern starts with an uppercase
+# letter (ASCII or the À-ſ accented range), an ASCII or fullwidth digit, or
+# the CJK chapter marker, so lines starting outside this set can skip the
+# regex engine
+_FIRST_CAP = frozenset(
+    string.ascii_uppercase + string.digits + '第'
+    + ''.join(chr(c) for c in range(0x00C0, 0x0180))
+    + ''.join(chr(c) for c in range(0xFF10, 0xFF1A))  # ０-９
+)
+
+# Fused level-classification alternation; alternatives are ordered exactly as
+# the original sequential checks so the first matching group decides the level.
+# Digits and spaces next to CJK text use explicit classes for the same
+# RE2-compatibility reason as above.
+_RE_LEVEL_UNION = _compile(
+    r'(?P<h1_chapter>^(?:Chapter|CHAPTER|第[0-9０-９]+章)\s*\d*)'
+    r'|(?P<h1_section>^(?:Section|SECTION|第[0-9０-９]+节)\s*\d*)'
+    r'|(?P<h1_num>^[0-9０-９]+[．.]?[\s　]+[A-ZÀ-ſ一-鿿])'
+    r'|(?P<h2_num>^[0-9０-９]+\.[0-9０-９]+[．.]?[\s　]+[A-ZÀ-ſ一-鿿])'
+    r'|(?P<h3_num>^[0-9０-９]+\.[0-9０-９]+\.[0-9０-９]+[．.]?[\s　]+[A-ZÀ-ſ一-鿿])'
+)
+_LEVEL_BY_GROUP = {
+    'h1_chapter': 'H1',
+    'h1_section': 'H1',
+    'h1_num': 'H1',
+    'h2_num': 'H2',
+    'h3_num': 'H3',
+}
+
+_RE_NUM_PREFIX_H1 = _compile(r'^\d+\.?\s+')
+_RE_NUM_PREFIX_H2 = _compile(r'^\d+\.\d+\.?\s+')
+
+# PyMuPDF span flag bit for bold text
+_BOLD = 16
+
+# Sentinel title returned when a PDF cannot be processed; such results must
+# never be cached, or a transient failure would be served forever
+_ERROR_TITLE = "Error Processing Document"
+
+# Text extraction flags: the heading scan only needs text spans, so skip the
+# image extraction that the default get_text("dict") flags include
+_TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
 class PDFOutlineExtractor:
-    def __init__(self):
-        self.heading_patterns = [
-            # English patterns
-            r'^(?:Chapter|CHAPTER)\s+\d+',
-            r'^(?:Section|SECTION)\s+\d+',
-            r'^\d+\.?\s+[A-Z\u00C0-\u017F][^.]*$',  # Unicode support for accented chars
-            r'^\d+\.\d+\.?\s+[A-Z\u00C0-\u017F][^.]*$',
-            r'^\d+\.\d+\.\d+\.?\s+[A-Z\u00C0-\u017F][^.]*$',
-            r'^[A-Z\u00C0-\u017F][A-Z\s\u00C0-\u017F]{2,}$',  # ALL CAPS headers with unicode
-            r'^[A-Z\u00C0-\u017F][a-z\u00C0-\u017F].*[^.]$',  # Title case without period
-            # Multilingual patterns (Japanese, Chinese, etc.)
-            r'^第\d+章',  # Japanese chapter
-            r'^第\d+节',  # Chinese section
-            r'^\d+[．.]\s*[\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff]+',  # CJK with numbers
-        ]
-        
     def extract_title(self, doc: fitz.Document) -> str:
         """Extract document title from metadata or first page"""
         # Try metadata first
@@ -46,64 +117,28 @@ class PDFOutlineExtractor:
         if len(doc) > 0:
             first_page = doc[0]
             text = first_page.get_text()
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
             
-            # Look for title-like text in first few lines
-            for i, line in enumerate(lines[:5]):
+            # Look for title-like text in the first few non-empty lines;
+            # islice stops stripping once five candidates are found
+            lines = itertools.islice(
+                (line for line in map(str.strip, text.split('\n')) if line), 5
+            )
+            for line in lines:
                 if len(line) > 5 and len(line) < 100:
                     # Check if it looks like a title (not too long, meaningful)
-                    if not re.match(r'^\d+$', line) and not line.lower().startswith('page'):
+                    if not _RE_PAGE_NUMBER.match(line) and not line.lower().startswith('page'):
                         return line
         
         return "Untitled Document"
     
-    def analyze_text_style(self, page: fitz.Page, text_dict: Dict) -> Dict[str, Any]:
-        """Analyze text styling to determine heading levels"""
-        style_info = {}
-        
-        # Get font size and style information
-        try:
-            blocks = page.get_text("dict")["blocks"]
-            for block in blocks:
-                if "lines" in block:
-                    for line in block["lines"]:
-                        for span in line["spans"]:
-                            text = span["text"].strip()
-                            if text:
-                                font_size = span["size"]
-                                font_flags = span["flags"]
-                                
-                                # Store style information
-                                if text not in style_info:
-                                    style_info[text] = {
-                                        'font_size': font_size,
-                                        'is_bold': bool(font_flags & 2**4),
-                                        'is_italic': bool(font_flags & 2**1),
-                                    }
-        except Exception as e:
-            logger.warning(f"Error analyzing text style: {e}")
-        
-        return style_info
-    
     def classify_heading_level(self, text: str, font_size: float, is_bold: bool, 
                              avg_font_size: float, max_font_size: float) -> str:
         """Classify text as H1, H2, or H3 based on styling and patterns"""
         
         # Pattern-based classification with multilingual support
-        if re.match(r'^(?:Chapter|CHAPTER|第\d+章)\s*\d*', text):
-            return "H1"
-        
-        if re.match(r'^(?:Section|SECTION|第\d+节)\s*\d*', text):
-            return "H1"
-        
-        if re.match(r'^\d+[．.]?\s+[A-Z\u00C0-\u017F\u4e00-\u9fff]', text):
-            return "H1"
-        
-        if re.match(r'^\d+\.\d+[．.]?\s+[A-Z\u00C0-\u017F\u4e00-\u9fff]', text):
-            return "H2"
-        
-        if re.match(r'^\d+\.\d+\.\d+[．.]?\s+[A-Z\u00C0-\u017F\u4e00-\u9fff]', text):
-            return "H3"
+        m = _RE_LEVEL_UNION.match(text)
+        if m:
+            return _LEVEL_BY_GROUP[m.lastgroup]
         
         # Size-based classification with improved thresholds
         size_ratio = font_size / avg_font_size if avg_font_size > 0 else 1
@@ -116,8 +151,9 @@ class PDFOutlineExtractor:
         elif size_ratio >= 1.15 or (is_bold and size_ratio >= 1.05):
             return "H3"
         
-        # Check for ALL CAPS (often headings)
-        if text.isupper() and len(text) > 5 and len(text) < 60:
+        # Check for ALL CAPS (often headings); a lowercase first character
+        # bails in O(1) before the full-string isupper() scan
+        if not text[0].islower() and text.isupper() and len(text) > 5 and len(text) < 60:
             if size_ratio >= 1.1:
                 return "H2"
             else:
@@ -129,17 +165,22 @@ class PDFOutlineExtractor:
         """Extract headings from PDF document"""
         headings = []
         
-        # Collect all text with styling information
-        all_text_info = []
-        font_sizes = []
+        # Collect all text with styling information as parallel columns
+        # (structure-of-arrays): avoids a dict allocation per line and keeps
+        # the numeric columns contiguous for the stats below
+        texts = []
+        pages = array('i')
+        font_sizes = array('d')
+        bold_flags = array('B')
         
         for page_num in range(len(doc)):
             page = doc[page_num]
-            style_info = self.analyze_text_style(page, {})
             
             # Get text blocks
             try:
-                blocks = page.get_text("dict")["blocks"]
+                # Build the TextPage once and extract from it directly
+                textpage = page.get_textpage(flags=_TEXT_FLAGS)
+                blocks = textpage.extractDICT()["blocks"]
                 for block in blocks:
                     if "lines" in block:
                         for line in block["lines"]:
@@ -148,21 +189,21 @@ class PDFOutlineExtractor:
                             line_is_bold = False
                             
                             for span in line["spans"]:
-                                text = span["text"].strip()
-                                if text:
-                                    line_text += text + " "
-                                    line_font_size = max(line_font_size, span["size"])
-                                    line_is_bold = line_is_bold or bool(span["flags"] & 2**4)
+                                span_text = span["text"]
+                                # isspace() is a single C-level pass; skip blank
+                                # spans before paying for strip()
+                                if not span_text or span_text.isspace():
+                                    continue
+                                line_text += span_text.strip() + " "
+                                line_font_size = max(line_font_size, span["size"])
+                                line_is_bold = line_is_bold or span["flags"] & _BOLD
                             
                             line_text = line_text.strip()
                             if line_text and len(line_text) > 3:
-                                all_text_info.append({
-                                    'text': line_text,
-                                    'page': page_num + 1,
-                                    'font_size': line_font_size,
-                                    'is_bold': line_is_bold
-                                })
+                                texts.append(line_text)
+                                pages.append(page_num + 1)
                                 font_sizes.append(line_font_size)
+                                bold_flags.append(1 if line_is_bold else 0)
                                 
             except Exception as e:
                 logger.warning(f"Error processing page {page_num + 1}: {e}")
@@ -175,9 +216,8 @@ class PDFOutlineExtractor:
         max_font_size = max(font_sizes)
         
         # Classify headings
-        for text_info in all_text_info:
-            text = text_info['text']
-            
+        seen = set()
+        for i, text in enumerate(texts):
             # Skip very long lines (likely body text)
             if len(text) > 150:
                 continue
@@ -186,18 +226,25 @@ class PDFOutlineExtractor:
             if text.endswith('.') and len(text) > 50:
                 continue
             
-            # Check if it matches heading patterns
-            is_heading = False
-            for pattern in self.heading_patterns:
-                if re.match(pattern, text):
-                    is_heading = True
-                    break
+            # Cheap body-text rejection before any classification work:
+            # headings start with an uppercase letter, a digit or a CJK
+            # character, and contain at most a few periods
+            first = text[0]
+            if not (first.isupper() or first.isdigit() or ord(first) >= 0x3040):
+                continue
+            
+            if text.count('.') > 3:
+                continue
+            
+            # Check if it matches heading patterns (single fused alternation);
+            # the O(1) first-character check deflects body text before the regex
+            is_heading = text[0] in _FIRST_CAP and _RE_HEADING_UNION.match(text) is not None
             
             # Check styling-based heading classification
             level = self.classify_heading_level(
                 text, 
-                text_info['font_size'], 
-                text_info['is_bold'],
+                font_sizes[i], 
+                bold_flags[i],
                 avg_font_size, 
                 max_font_size
             )
@@ -205,24 +252,25 @@ class PDFOutlineExtractor:
             if is_heading or level:
                 if not level:
                     # Default level if pattern matched but no style-based level
-                    if re.match(r'^\d+\.?\s+', text):
+                    if _RE_NUM_PREFIX_H1.match(text):
                         level = "H1"
-                    elif re.match(r'^\d+\.\d+\.?\s+', text):
+                    elif _RE_NUM_PREFIX_H2.match(text):
                         level = "H2"
                     else:
                         level = "H1"
                 
-                # Avoid duplicates
-                if not any(h['text'] == text and h['page'] == text_info['page'] for h in headings):
+                # Avoid duplicates (O(1) set lookup instead of scanning headings)
+                key = (text, pages[i])
+                if key not in seen:
+                    seen.add(key)
                     headings.append({
                         'level': level,
                         'text': text,
-                        'page': text_info['page']
+                        'page': pages[i]
                     })
         
-        # Sort by page number
-        headings.sort(key=lambda x: x['page'])
-        
+        # Headings are already in page order: lines are collected page by page
+        # and classified in collection order, so no sort is needed
         return headings
     
     def process_pdf(self, pdf_path: str) -> Dict[str, Any]:
@@ -248,10 +296,25 @@ class PDFOutlineExtractor:
         except Exception as e:
             logger.error(f"Error processing PDF {pdf_path}: {e}")
             return {
-                "title": "Error Processing Document",
+                "title": _ERROR_TITLE,
                 "outline": []
             }
 
+def _pdf_digest(pdf_file: Path) -> str:
+    """Hex digest of a PDF's bytes, used as the result-cache key"""
+    with open(pdf_file, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):  # Python 3.11+: zero-copy streaming
+            return hashlib.file_digest(f, 'sha256').hexdigest()[:16]
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+        return h.hexdigest()[:16]
+
+def _process_pdf_worker(pdf_path: str) -> Tuple[str, Dict[str, Any]]:
+    """Worker for multiprocessing: each process builds its own extractor"""
+    extractor = PDFOutlineExtractor()
+    return pdf_path, extractor.process_pdf(pdf_path)
+
 def main():
     """Main function to process PDFs from input directory"""
     logger.info("🚀 Starting PDF Outline Extractor")
@@ -266,9 +329,6 @@ def main():
     output_dir.mkdir(parents=True, exist_ok=True)
     logger.info("✅ Output directory ready")
     
-    extractor = PDFOutlineExtractor()
-    logger.info("✅ PDF extractor initialized")
-    
     # Process all PDF files in input directory
     pdf_files = list(input_dir.glob("*.pdf"))
     logger.info(f"🔍 Found {len(pdf_files)} PDF file(s)")
@@ -278,18 +338,60 @@ def main():
         logger.info("💡 Place PDF files in /app/input directory")
         return
     
+    # Result cache keyed by content hash: PDF parsing dominates runtime, so
+    # unchanged inputs from a previous run skip PyMuPDF entirely
+    cache_dir = Path("/app/cache")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    digests = {}
+    to_process = []
+    results = []
     for pdf_file in pdf_files:
-        logger.info(f"📄 Processing {pdf_file.name}")
+        digest = _pdf_digest(pdf_file)
+        digests[str(pdf_file)] = digest
+        cache_file = cache_dir / f"{digest}.json"
+        hit = None
+        if cache_file.exists():
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    hit = json.load(f)
+            except (OSError, ValueError) as e:
+                # A truncated entry from a killed run is just a cache miss
+                logger.warning(f"⚠️ Discarding unreadable cache entry for {pdf_file.name}: {e}")
+                hit = None
+        if hit is not None:
+            logger.info(f"♻️ Cache hit for {pdf_file.name}")
+            results.append((str(pdf_file), hit))
+        else:
+            to_process.append(str(pdf_file))
+    
+    # PyMuPDF is not thread-safe, so parallelize across worker processes
+    # (each PDF is independent); JSON outputs are written in the main process
+    if to_process:
+        with Pool(min(cpu_count(), len(to_process))) as pool:
+            results.extend(pool.map(_process_pdf_worker, to_process))
+    
+    processed = set(to_process)
+    for pdf_path, result in results:
+        pdf_file = Path(pdf_path)
+        logger.info(f"📄 Processed {pdf_file.name}")
         
         try:
-            # Extract outline
-            result = extractor.process_pdf(str(pdf_file))
-            
             # Save result
             output_file = output_dir / f"{pdf_file.stem}.json"
             with open(output_file, 'w', encoding='utf-8') as f:
                 json.dump(result, f, indent=2, ensure_ascii=False)
             
+            # Record freshly processed results in the cache, but never cache
+            # the error sentinel; write via rename so a killed run cannot
+            # leave a truncated entry behind
+            if pdf_path in processed and result['title'] != _ERROR_TITLE:
+                cache_file = cache_dir / f"{digests[pdf_path]}.json"
+                tmp_file = cache_file.with_suffix('.json.tmp')
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False)
+                os.replace(tmp_file, cache_file)
+            
             logger.info(f"✅ Saved outline to {output_file}")
             logger.info(f"   📊 Title: {result['title']}")
             logger.info(f"   📋 Found {len(result['outline'])} headings")